@@ -21,10 +21,42 @@ saving.
 '''
 
 ### Imports ###
+import collections
 import datetime
+import math
 import numpy as np
 import matplotlib.pyplot as plt
 
+### Random number generator ###
+# A single module-wide PCG64 generator, shared by all simulations.
+_RNG = np.random.default_rng()
+
+### Chunking settings ###
+# Simulations are run in chunks of this many at a time so that the
+# working set of the weekly updates stays cache-sized however large n is.
+_CHUNK_SIZE = 4096
+# How many simulations keep their full weekly trajectories for the
+# time-series plot; the rest only contribute their final balances.
+_PLOT_SAMPLE = 200
+
+### Parameter container ###
+# The starting balances and precomputed per-week constants of a run,
+# built once in simulate() and passed to every _simulate_chunk call.
+Params = collections.namedtuple('Params',
+                                ['savings_now', 'savings_rate',
+                                 'isa_now', 'isa_loc', 'isa_scale',
+                                 'isa_contrib',
+                                 'lisa_now', 'lisa_loc', 'lisa_scale',
+                                 'lisa_contrib',
+                                 'spend_mean', 'spend_stdev',
+                                 'weekly_inflow'])
+
+### Result container ###
+# The weekly balance arrays produced by one chunk of simulations,
+# one (size, n_weeks) array per simulated account.
+SimResult = collections.namedtuple('SimResult',
+                                   ['savings_account', 'isa', 'lisa'])
+
 ### Functions ###
 def main():
     ''' The main function. '''
@@ -93,47 +125,65 @@ def simulate(n):
     time_final = time_now + datetime.timedelta(days=7*n_weeks)
     date_final = time_final.strftime("%d/%m/%Y")
 
-    # Runs n single simulations and saves the weekly data to lists
-    # for the current account, savings account, ISA and LISA.
-    savings_account_results = []
-    current_account_results = []
-    isa_results = []
-    lisa_results = []
-    for i in range(n):
-        sim_results = run_single_simulation(current_account_balance_now=current_account_balance_now,
-                        savings_account_balance_now=savings_account_balance_now,
-                        savings_account_interest=savings_account_interest,
-                        isa_balance_now=isa_balance_now,
-                        isa_stdev=isa_stdev,
-                        isa_mean=isa_mean,
-                        isa_weekly_payment=isa_weekly_payment,
-                        lisa_balance_now=lisa_balance_now,
-                        lisa_stdev=lisa_stdev,
-                        lisa_mean=lisa_mean,
-                        lisa_weekly_payment=lisa_weekly_payment,
-                        weekly_spendings_mean=weekly_spendings_mean,
-                        weekly_spendings_stdev=weekly_spendings_stdev,
-                        annual_inflow=annual_inflow,
-                        n_weeks=n_weeks)
-        savings_account_results.append(sim_results['savings_account'])
-        current_account_results.append(sim_results['current_account'])
-        isa_results.append(sim_results['isa'])
-        lisa_results.append(sim_results['lisa'])
+    # Bundle the starting balances and the constant per-week scalars into
+    # a single Params object, computed once for all chunks. math.sqrt is
+    # used rather than np.sqrt so the scales stay plain Python floats and
+    # do not promote the float32 draws in the engine back to float64.
+    params = Params(savings_now=savings_account_balance_now,
+                    savings_rate=(savings_account_interest/100) / 52,
+                    isa_now=isa_balance_now,
+                    isa_loc=(isa_mean/100) / 52,
+                    isa_scale=(isa_stdev/100) / math.sqrt(52),
+                    isa_contrib=isa_weekly_payment,
+                    lisa_now=lisa_balance_now,
+                    lisa_loc=(lisa_mean/100) / 52,
+                    lisa_scale=(lisa_stdev/100) / math.sqrt(52),
+                    lisa_contrib=lisa_weekly_payment*1.25,
+                    spend_mean=weekly_spendings_mean,
+                    spend_stdev=weekly_spendings_stdev,
+                    weekly_inflow=annual_inflow/52)
+
+    # Runs the n simulations in chunks and streams out only what is needed
+    # downstream: the final balance of every simulation, plus the full
+    # weekly trajectories of a small sample for the time-series plot.
+    n_plot = min(n, _PLOT_SAMPLE)
+    savings_account_results = np.empty((n_plot, n_weeks), dtype=np.float32)
+    isa_results = np.empty((n_plot, n_weeks), dtype=np.float32)
+    lisa_results = np.empty((n_plot, n_weeks), dtype=np.float32)
+    # The final balances are accumulated in float64 so that the means and
+    # standard deviations lose no precision.
+    savings_account_final = np.empty(n)
+    isa_final = np.empty(n)
+    lisa_final = np.empty(n)
+    for start in range(0, n, _CHUNK_SIZE):
+        size = min(_CHUNK_SIZE, n - start)
+        chunk = _simulate_chunk(params, size, n_weeks)
+        savings_account_final[start:start+size] = chunk.savings_account[:, -1]
+        isa_final[start:start+size] = chunk.isa[:, -1]
+        lisa_final[start:start+size] = chunk.lisa[:, -1]
+        keep = min(size, n_plot - start)
+        if keep > 0:
+            savings_account_results[start:start+keep] = chunk.savings_account[:keep]
+            isa_results[start:start+keep] = chunk.isa[:keep]
+            lisa_results[start:start+keep] = chunk.lisa[:keep]
 
     ### Plots ###
-    # Time series plot, showing all n simulations showing balance against time.
+    # Time series plot, showing a sample of the simulations' balances
+    # against time.
+    # Each (n, n_weeks) array is plotted in a single call: matplotlib treats
+    # every column of a 2-D y-array as a separate line. The first simulation
+    # is plotted on its own to provide the legend labels.
+    weeks = np.arange(n_weeks)
     fig, ax = plt.subplots()
-    for i in range(n):
-        if i == 0:
-            ax.plot(np.arange(0, n_weeks, 1), savings_account_results[i], color='red', label='Savings Account')
-            ax.plot(np.arange(0, n_weeks, 1), current_account_results[i], color='blue', label='Current Account')
-            ax.plot(np.arange(0, n_weeks, 1), isa_results[i], color='green', label='ISA')
-            ax.plot(np.arange(0, n_weeks, 1), lisa_results[i], color='orange', label='LISA')
-        else:
-            ax.plot(np.arange(0, n_weeks, 1), savings_account_results[i], color='red')
-            ax.plot(np.arange(0, n_weeks, 1), current_account_results[i], color='blue')
-            ax.plot(np.arange(0, n_weeks, 1), isa_results[i], color='green')
-            ax.plot(np.arange(0, n_weeks, 1), lisa_results[i], color='orange')
+    ax.plot(weeks, savings_account_results[0], color='red', label='Savings Account')
+    # The current account balance is constant in every simulation, so a
+    # single horizontal line shows all of them.
+    ax.axhline(current_account_balance_now, color='blue', label='Current Account')
+    ax.plot(weeks, isa_results[0], color='green', label='ISA')
+    ax.plot(weeks, lisa_results[0], color='orange', label='LISA')
+    ax.plot(weeks, savings_account_results[1:].T, color='red')
+    ax.plot(weeks, isa_results[1:].T, color='green')
+    ax.plot(weeks, lisa_results[1:].T, color='orange')
     fig.legend(ncols=4, loc='upper center', bbox_to_anchor=(0.5, 0.95))
     fig.suptitle(f'Financial projection ({date_initial} - {date_final})')
     ax.set_xlabel('Time (weeks)')
@@ -142,50 +192,37 @@ def simulate(n):
     plt.close()
 
     # Histograms, showing the final balance values for all n simulations for
-    # each account.
-    savings_account_final = [i[-1] for i in savings_account_results]
-    current_account_final = [i[-1] for i in current_account_results]
-    current_and_savings_final = [savings_account_final[i]+current_account_final[i] for i in range(n)]
-    isa_final = [i[-1] for i in isa_results]
-    lisa_final = [i[-1] for i in lisa_results]
-    total_final = np.array([savings_account_final[i]+current_account_final[i]+isa_final[i]+lisa_final[i] for i in range(n)])
+    # each account. The bin count is computed once and shared by all of them.
+    nbins = max(10, int(round(n ** 0.33)))
+    current_and_savings_final = savings_account_final + current_account_balance_now
+    total_final = current_and_savings_final + isa_final + lisa_final
+    # The current+savings and total histograms share the same bin edges so
+    # that the two distributions can be compared directly by eye.
+    shared_edges = np.histogram_bin_edges(
+        np.concatenate((current_and_savings_final, total_final)), bins=nbins)
 
     # Final Current Account balance histogram
-    fig, ax = plt.subplots()
-    ax.hist(current_and_savings_final, bins=int(n**0.33))
     # Probability of ending up lower than last year (total balance)
-    current_and_savings_final = np.array(current_and_savings_final)
-    p_lower = len(current_and_savings_final[current_and_savings_final<0])/n * 100
-    fig.suptitle(fr'Mean Current+Savings Balance at {date_final} is £{np.mean(current_and_savings_final):.0f} $\pm$ £{np.std(current_and_savings_final):.0f}'\
-                 f'\nProbability of Current+Savings Balance below 0 is {p_lower:.1f}%')
-    ax.set_xlabel('Balance (£)')
-    ax.set_ylabel('Frequency')
-    plt.show()
-    plt.close()
+    p_lower = np.count_nonzero(current_and_savings_final < 0)/n * 100
+    _plot_histogram(current_and_savings_final, shared_edges,
+                    fr'Mean Current+Savings Balance at {date_final} is £{np.mean(current_and_savings_final):.0f} $\pm$ £{np.std(current_and_savings_final):.0f}'\
+                    f'\nProbability of Current+Savings Balance below 0 is {p_lower:.1f}%')
 
     # Final ISA Account balance histogram
-    fig, ax = plt.subplots()
-    ax.hist(isa_final, bins=int(n**0.33))
-    fig.suptitle(fr'Mean ISA Balance at {date_final} is £{np.mean(isa_final):.0f} $\pm$ £{np.std(isa_final):.0f}')
-    ax.set_xlabel('Balance (£)')
-    ax.set_ylabel('Frequency')
-    plt.show()
-    plt.close()
+    _plot_histogram(isa_final, nbins,
+                    fr'Mean ISA Balance at {date_final} is £{np.mean(isa_final):.0f} $\pm$ £{np.std(isa_final):.0f}')
 
     # Final LISA Account balance histogram
-    fig, ax = plt.subplots()
-    ax.hist(lisa_final, bins=int(n**0.33))
-    fig.suptitle(fr'Mean LISA Balance at {date_final} is £{np.mean(lisa_final):.0f} $\pm$ £{np.std(lisa_final):.0f}')
-    ax.set_xlabel('Balance (£)')
-    ax.set_ylabel('Frequency')
-    plt.show()
+    _plot_histogram(lisa_final, nbins,
+                    fr'Mean LISA Balance at {date_final} is £{np.mean(lisa_final):.0f} $\pm$ £{np.std(lisa_final):.0f}')
 
     # Final total balance of all accounts histogram
+    counts, edges = np.histogram(total_final, bins=shared_edges)
     fig, ax = plt.subplots()
-    ax.hist(total_final, bins=int(n**0.33))
+    ax.stairs(counts, edges, fill=True)
     # Probability of ending up lower than last year (total balance)
     total_start = current_account_balance_now+savings_account_balance_now+isa_balance_now+lisa_balance_now
-    p_lower = len(total_final[total_final<total_start])/n * 100
+    p_lower = np.count_nonzero(total_final < total_start)/n * 100
     ax.axvline(x=current_account_balance_now+savings_account_balance_now+isa_balance_now+lisa_balance_now, 
                linestyle='--', label=f'Initial Total Balance (£{total_start:.0f}) at {date_initial}: p(total final < total initial)={p_lower:.1f}%', 
                color='black')
@@ -197,78 +234,87 @@ def simulate(n):
     ax.set_ylabel('Frequency')
     plt.subplots_adjust(top=0.8)
     plt.show()
+    plt.close()
+
 
+def _plot_histogram(data, bins, title):
+    ''' Plots one final-balance histogram and closes its figure.
+
+    `bins` can be a bin count or a precomputed array of bin edges, as
+    accepted by np.histogram.
+    '''
+    counts, edges = np.histogram(data, bins=bins)
+    fig, ax = plt.subplots()
+    ax.stairs(counts, edges, fill=True)
+    fig.suptitle(title)
+    ax.set_xlabel('Balance (£)')
+    ax.set_ylabel('Frequency')
+    plt.show()
+    plt.close()
 
-def run_single_simulation(current_account_balance_now,
-                        savings_account_balance_now,
-                        savings_account_interest,
-                        lisa_balance_now,
-                        isa_balance_now,
-                        isa_weekly_payment,
-                        isa_stdev,
-                        isa_mean,
-                        lisa_stdev,
-                        lisa_mean,
-                        lisa_weekly_payment,
-                        weekly_spendings_mean,
-                        weekly_spendings_stdev,
-                        annual_inflow,
-                        n_weeks):
-    ''' Runs a single simple Monte-Carlo simulation. '''
-
-    # Initialise lists
-    lisa = [0]*n_weeks
-    savings_account = [0]*n_weeks
-    current_account = [0]*n_weeks
-    isa = [0]*n_weeks
-    # Set the balance at the beginning of Week 0 to the current values
-    # for the balance of the LISA, ISA, Current Account and Savings Account
-    lisa[0] = lisa_balance_now
-    savings_account[0] = savings_account_balance_now
-    current_account[0] = current_account_balance_now
-    isa[0] = isa_balance_now
-
-    # Run the Monte-Carlo Simulation
-    # Iterate over number of weeks
+
+def _simulate_chunk(params, size, n_weeks):
+    ''' Runs one chunk of `size` Monte-Carlo simulations at once.
+
+    Each week updates every simulation in a single vectorized step.
+    Returns a SimResult of (size, n_weeks) arrays with the weekly
+    balances of the savings account, ISA and LISA, one simulation per
+    row. The current account is assumed constant, so it is not
+    simulated at all.
+    '''
+    # Draw the weekly spendings and the weekly ISA/LISA interest rates for
+    # all simulations and all weeks in one go. Balances in pounds do not
+    # need float64 precision, so everything is stored as float32 to halve
+    # the memory traffic of the weekly updates.
+    spend = (_RNG.standard_normal((size, n_weeks-1), dtype=np.float32) * params.spend_stdev
+             + params.spend_mean)
+    isa_rates = (_RNG.standard_normal((size, n_weeks-1), dtype=np.float32) * params.isa_scale
+                 + params.isa_loc)
+    lisa_rates = (_RNG.standard_normal((size, n_weeks-1), dtype=np.float32) * params.lisa_scale
+                  + params.lisa_loc)
+
+    ### ISA and LISA ###
+    # Each week adds the injected cash (125% of it for the LISA, since
+    # 25% is provided by the government) and applies the normally
+    # distributed interest. That recurrence has a closed form, so the
+    # whole trajectories are built without looping over the weeks.
+    isa = _grow_account(params.isa_now, params.isa_contrib, isa_rates)
+    lisa = _grow_account(params.lisa_now, params.lisa_contrib, lisa_rates)
+
+    ### Savings Account ###
+    # The random spendings enter additively, so this recurrence has no
+    # multiplicative closed form and keeps the week loop, updating whole
+    # columns at once. Week 0 is the current balance; each later week
+    # adds 1/52th of the annual income, takes away the weekly spendings
+    # and applies interest, fused into a single update.
+    savings_account = np.empty((size, n_weeks), dtype=np.float32)
+    savings_account[:, 0] = params.savings_now
     for week in range(1, n_weeks):
+        savings_account[:, week] = ((savings_account[:, week-1]
+                                     + params.weekly_inflow
+                                     - spend[:, week-1])
+                                    * (1.0 + params.savings_rate))
+
+    return SimResult(savings_account=savings_account, isa=isa, lisa=lisa)
+
+
+def _grow_account(balance_now, contrib, rates):
+    ''' Expands x[t] = (x[t-1] + contrib) * (1 + rates[t-1]) in closed form.
+
+    Dividing the recurrence through by the cumulative growth factor
+    P[t] = prod(1 + rates[:t]) turns it into a plain cumulative sum, so
+    the whole (size, n_weeks) trajectory is built from one cumprod and
+    one cumsum instead of a loop over the weeks.
+    '''
+    size, n_draws = rates.shape
+    growth = np.empty((size, n_draws + 1), dtype=np.float32)
+    growth[:, 0] = 1.0
+    np.cumprod(1.0 + rates, axis=1, out=growth[:, 1:])
+    deposits = np.empty_like(growth)
+    deposits[:, 0] = balance_now
+    np.cumsum(contrib / growth[:, :-1], axis=1, out=deposits[:, 1:])
+    deposits[:, 1:] += balance_now
+    return growth * deposits
 
-        ### Savings Account ###
-        # Step 1: Add 1/52th of the annual income
-        # Step 2: Take away weekly spendings which we assume 
-        # are normally distributed.
-        # Step 3: Apply interest.
-        # These steps are reflected below.
-        savings_account[week] = (savings_account[week-1]
-                            + annual_inflow/52
-                            - np.random.normal(loc=weekly_spendings_mean,
-                                            scale=weekly_spendings_stdev))
-        savings_account[week] += (savings_account[week] 
-                                  * (savings_account_interest/100) 
-                                  / 52)
-
-        ### Current Account ###
-        # Assume that the balance in the current account 
-        # remains roughly constant.
-        current_account[week] = current_account[week-1]
-
-        ### ISA ###
-        # Step 1: Add injected cash.
-        # Step 2: Apply interest which is normally distributed.
-        isa[week] = isa[week-1] + isa_weekly_payment
-        isa[week] += isa[week] * np.random.normal(loc=(isa_mean/100) / 52,
-                                            scale=(isa_stdev/100) / np.sqrt(52))
-        ### LISA ###
-        # Step 1: Add 125% injected cash since 25% is provided by the government.
-        # Step 2: Apply interest which is normally distributed.
-        lisa[week] = lisa[week-1] + lisa_weekly_payment*1.25
-        lisa[week] += lisa[week] * np.random.normal(loc=(lisa_mean/100) / 52,
-                                            scale=(lisa_stdev/100) / np.sqrt(52))
-
-    # Return a dictionary with values showing 
-    # the weekly balances of each account.
-    return {'savings_account':savings_account, 
-            'current_account':current_account, 
-            'lisa':lisa, 
-            'isa': isa}
 if __name__ == '__main__':
     main()
\ No newline at end of file